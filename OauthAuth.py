@@ -6,7 +6,7 @@ from functools import lru_cache
 
 load_dotenv(override=True)
 
-logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+logging.basicConfig(level=os.getenv('LOG_LEVEL', 'INFO').upper(), format='%(asctime)s - %(levelname)s - %(message)s')
 
 session = requests.Session()
 
@@ -15,7 +15,7 @@ def oauth_bearer_token():
     
     client_id = os.getenv('CLIENT_ID')
     client_secret = os.getenv('CLIENT_SECRET')
-    print(client_id)
+    logging.debug(f"Requesting OAuth token for client {client_id}")
 
     base_url = os.getenv('COLLIBRA_INSTANCE_URL')
     url = f"https://{base_url}/rest/oauth/v2/token"
@@ -1,47 +1,219 @@
 import asyncio
+import hashlib
+import os
+import time
 import aiohttp
-from typing import List, Dict, Any
+import orjson
+from aiolimiter import AsyncLimiter
+from aiohttp_client_cache import CachedSession, SQLiteBackend
+from typing import List, Dict, Any, Tuple
 import json
+import logging
+from dotenv import load_dotenv
 
-async def make_concurrent_requests(urls: List[Dict[str, Any]], auth: aiohttp.BasicAuth, chunk_size: int = 10) -> List[Dict[str, Any]]:
+# Settings below are read at import time, so .env must be loaded first
+load_dotenv(override=True)
+
+logger = logging.getLogger(__name__)
+
+# Request throttling, configurable through environment variables
+INITIAL_CONCURRENT_REQUESTS = int(os.getenv('INITIAL_CONCURRENT_REQUESTS', '10'))
+MAX_CONCURRENT_REQUESTS = int(os.getenv('MAX_CONCURRENT_REQUESTS', '64'))
+MAX_REQUESTS_PER_SECOND = float(os.getenv('MAX_REQUESTS_PER_SECOND', '20'))
+MAX_RETRIES = int(os.getenv('MAX_RETRIES', '3'))
+
+# Responses signalling that the server wants clients to slow down
+THROTTLE_STATUSES = (429, 503)
+
+class AdaptiveConcurrencyLimiter:
+    """
+    Concurrency limit tuned by additive increase / multiplicative decrease.
+    
+    The limit is halved once per congestion event and raised by one after a
+    run of consecutive successful responses, up to a maximum. Throttled
+    requests that started before the last decrease belong to the event that
+    caused it and do not lower the limit again.
+    """
+    def __init__(self, initial: int, maximum: int, increase_after: int = 100):
+        self.limit = min(initial, maximum)
+        self.maximum = maximum
+        self.increase_after = increase_after
+        self._active = 0
+        self._successes = 0
+        self._last_decrease = float('-inf')
+        self._condition = asyncio.Condition()
+
+    async def __aenter__(self):
+        async with self._condition:
+            await self._condition.wait_for(lambda: self._active < self.limit)
+            self._active += 1
+
+    async def __aexit__(self, *exc_info):
+        async with self._condition:
+            self._active -= 1
+            self._condition.notify(max(self.limit - self._active, 0))
+
+    def record(self, status: int, started_at: float):
+        """
+        Adjust the limit based on the status of a completed response sent at started_at (time.monotonic()).
+        """
+        if status in THROTTLE_STATUSES:
+            if started_at >= self._last_decrease:
+                self.limit = max(1, self.limit // 2)
+                self._last_decrease = time.monotonic()
+            self._successes = 0
+        elif 200 <= status < 300:
+            self._successes += 1
+            if self._successes >= self.increase_after and self.limit < self.maximum:
+                self.limit += 1
+                self._successes = 0
+
+# Shared across all callers so concurrent asset types respect one global limit
+_concurrency = AdaptiveConcurrencyLimiter(INITIAL_CONCURRENT_REQUESTS, MAX_CONCURRENT_REQUESTS)
+_limiter = AsyncLimiter(MAX_REQUESTS_PER_SECOND, 1)
+
+class InflightRequest:
+    """
+    A request shared by every caller that issued it while it was in flight.
+    """
+    def __init__(self, task: asyncio.Task):
+        self.task = task
+        self.waiters = 0
+
+# Requests currently in flight, so identical concurrent requests share one response
+_inflight: Dict[Tuple, InflightRequest] = {}
+
+# On-disk response cache; count queries are POSTed through GraphQL so POST is cached too.
+# Each OAuth client gets its own cache file so one client never sees another's responses.
+HTTP_CACHE_NAME = os.getenv('HTTP_CACHE_NAME', 'collibra_cache')
+HTTP_CACHE_EXPIRE_AFTER = int(os.getenv('HTTP_CACHE_EXPIRE_AFTER', '3600'))
+
+def create_session(bearer_token: str) -> CachedSession:
+    """
+    Create the HTTP session shared by all requests so connections are kept alive and reused.
+    The OAuth bearer token is registered once as a default header for every request.
+    
+    Responses are cached in SQLite for HTTP_CACHE_EXPIRE_AFTER seconds, in a file
+    per OAuth client. Requests sent with refresh=True revalidate cached responses
+    that carry an ETag or Last-Modified header; others are served until they expire.
+    """
+    connector = aiohttp.TCPConnector(limit=100, ttl_dns_cache=300, keepalive_timeout=75)
+    client_hash = hashlib.sha256(os.getenv('CLIENT_ID', '').encode()).hexdigest()[:16]
+    cache = SQLiteBackend(
+        cache_name=f"{HTTP_CACHE_NAME}_{client_hash}",
+        expire_after=HTTP_CACHE_EXPIRE_AFTER,
+        allowed_methods=('GET', 'POST')
+    )
+    headers = {
+        'Authorization': f'Bearer {bearer_token}',
+        'Content-Type': 'application/json'
+    }
+    return CachedSession(
+        cache=cache,
+        connector=connector,
+        headers=headers,
+        json_serialize=lambda value: orjson.dumps(value).decode()
+    )
+
+async def make_concurrent_requests(urls: List[Dict[str, Any]], session: aiohttp.ClientSession) -> List[Dict[str, Any]]:
     """
     Make concurrent API requests with rate limiting.
     
+    Concurrency adapts process-wide between 1 and MAX_CONCURRENT_REQUESTS and
+    the request rate is capped by MAX_REQUESTS_PER_SECOND. Throttled requests
+    are retried after the server's Retry-After delay. Identical requests issued while one is
+    already in flight wait for that response instead of being sent again.
+    
     Args:
         urls: List of dictionaries containing URL and request details
-        auth: aiohttp BasicAuth credentials
-        chunk_size: Number of concurrent requests to make at once
+        session: Shared aiohttp session used for all requests
     
     Returns:
         List of response data
     """
     async def fetch(session: aiohttp.ClientSession, request_info: Dict[str, Any]) -> Dict[str, Any]:
         try:
-            async with session.request(
-                method=request_info.get('method', 'GET'),
-                url=request_info['url'],
-                params=request_info.get('params'),
-                json=request_info.get('json'),
-                headers=request_info.get('headers', {'Content-Type': 'application/json'})
-            ) as response:
-                return await response.json()
+            for attempt in range(MAX_RETRIES + 1):
+                async with _concurrency, _limiter:
+                    started_at = time.monotonic()
+                    async with session.request(
+                        method=request_info.get('method', 'GET'),
+                        url=request_info['url'],
+                        params=request_info.get('params'),
+                        json=request_info.get('json'),
+                        refresh=True
+                    ) as response:
+                        _concurrency.record(response.status, started_at)
+                        if response.status not in THROTTLE_STATUSES or attempt == MAX_RETRIES:
+                            data = orjson.loads(await response.read())
+                            if isinstance(data, dict) and 'errors' in data:
+                                await evict_cached_response(session, request_info)
+                            return data
+                        delay = retry_after(response)
+                
+                logger.warning(
+                    "Throttled on %s (HTTP %s), retrying in %ss with concurrency %d",
+                    request_info['url'], response.status, delay, _concurrency.limit
+                )
+                await asyncio.sleep(delay)
         except Exception as e:
-            print(f"Error fetching {request_info['url']}: {str(e)}")
+            logger.error("Error fetching %s: %s", request_info['url'], e)
             return {'error': str(e)}
 
-    async def process_chunk(session: aiohttp.ClientSession, chunk: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
-        tasks = [fetch(session, request_info) for request_info in chunk]
-        return await asyncio.gather(*tasks)
-
-    results = []
-    async with aiohttp.ClientSession(auth=auth) as session:
-        for i in range(0, len(urls), chunk_size):
-            chunk = urls[i:i + chunk_size]
-            chunk_results = await process_chunk(session, chunk)
-            results.extend(chunk_results)
-            
-            # Add a small delay between chunks to prevent overwhelming the server
-            if i + chunk_size < len(urls):
-                await asyncio.sleep(0.5)
-
-    return results
\ No newline at end of file
+    async def coalesced_fetch(session: aiohttp.ClientSession, request_info: Dict[str, Any]) -> Dict[str, Any]:
+        key = request_key(request_info)
+        inflight = _inflight.get(key)
+        if inflight is None:
+            inflight = InflightRequest(asyncio.ensure_future(fetch(session, request_info)))
+            _inflight[key] = inflight
+            inflight.task.add_done_callback(
+                lambda _: _inflight.pop(key) if _inflight.get(key) is inflight else None
+            )
+        
+        inflight.waiters += 1
+        try:
+            # Shielded so a cancelled caller does not cancel the request for everyone sharing it
+            return await asyncio.shield(inflight.task)
+        finally:
+            inflight.waiters -= 1
+            # Once every caller has been cancelled, nobody needs the response any more
+            if inflight.waiters == 0 and not inflight.task.done():
+                inflight.task.cancel()
+                if _inflight.get(key) is inflight:
+                    del _inflight[key]
+
+    return await asyncio.gather(*(coalesced_fetch(session, request_info) for request_info in urls))
+
+async def evict_cached_response(session: CachedSession, request_info: Dict[str, Any]):
+    """
+    Remove a response from the HTTP cache. GraphQL errors come back with status 200 and
+    would otherwise be cached, replaying the failure on every rerun until the entry expires.
+    """
+    await session.cache.delete_url(
+        request_info['url'],
+        method=request_info.get('method', 'GET'),
+        params=request_info.get('params'),
+        json=request_info.get('json')
+    )
+
+def retry_after(response: aiohttp.ClientResponse) -> float:
+    """
+    Read the Retry-After delay in seconds from a throttled response, defaulting to one second.
+    """
+    try:
+        return max(float(response.headers.get('Retry-After', '1')), 0)
+    except ValueError:
+        return 1
+
+def request_key(request_info: Dict[str, Any]) -> Tuple:
+    """
+    Build a hashable key identifying a request by method, URL, query parameters and JSON body.
+    """
+    params = request_info.get('params')
+    body = request_info.get('json')
+    return (
+        request_info.get('method', 'GET'),
+        request_info['url'],
+        frozenset(params.items()) if params else None,
+        orjson.dumps(body, option=orjson.OPT_SORT_KEYS) if body is not None else None
+    )
\ No newline at end of file
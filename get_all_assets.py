@@ -1,73 +1,141 @@
-import asyncio
+import os
 import aiohttp
-from typing import List
+import ijson
+import orjson
+from typing import AsyncIterator, List, Optional
 import json
+import logging
+from dotenv import load_dotenv
 
-async def get_all_assets_async(asset_type_id: str, base_url: str, bearer_token: str) -> List[str]:
+# Settings below are read at import time, so .env must be loaded first
+load_dotenv(override=True)
+
+logger = logging.getLogger(__name__)
+
+# Number of asset IDs requested per GraphQL page
+ASSET_PAGE_SIZE = int(os.getenv('ASSET_PAGE_SIZE', '1000'))
+
+# Responses larger than this (or of unknown size) are parsed incrementally
+STREAM_THRESHOLD_BYTES = int(os.getenv('STREAM_THRESHOLD_BYTES', str(1024 * 1024)))
+# Number of streamed asset IDs handed to the caller at a time
+STREAM_BATCH_SIZE = 250
+
+class AssetListingError(Exception):
     """
-    Get all asset IDs using async GraphQL query with OAuth authentication.
+    Raised when a page of the asset listing cannot be fetched, so callers never see a truncated list.
     """
-    url = f"{base_url}/graphql/knowledgeGraph/v1"
+
+def build_assets_query(after: Optional[str]) -> str:
+    """
+    Build the paginated assets query. Pages are keyed on the last asset ID of the previous page.
+    """
+    if after is None:
+        where = "{ type: { id: { eq: $typeId } } }"
+        params = "$typeId: UUID!, $limit: Int!"
+    else:
+        where = "{ type: { id: { eq: $typeId } }, id: { gt: $after } }"
+        params = "$typeId: UUID!, $limit: Int!, $after: UUID!"
     
-    query = """
-    query Assets($typeId: UUID!) {
+    return f"""
+    query Assets({params}) {{
         assets(
-            where: { type: { id: { eq: $typeId } } }
-            limit: 50000
-        ) {
+            where: {where}
+            order: {{ id: asc }}
+            limit: $limit
+        ) {{
             id
-        }
-    }
+        }}
+    }}
     """
+
+async def get_all_assets_async(asset_type_id: str, base_url: str, session: aiohttp.ClientSession) -> AsyncIterator[List[str]]:
+    """
+    Get all asset IDs using async GraphQL queries with OAuth authentication.
+    Yields one page of asset IDs at a time so callers can start processing before the listing finishes;
+    large pages are parsed as they stream in and yielded in smaller batches.
     
-    payload = {
-        "query": query,
-        "variables": {"typeId": asset_type_id}
-    }
-    
-    headers = {
-        'Authorization': f'Bearer {bearer_token}',
-        'Content-Type': 'application/json'
-    }
+    Raises AssetListingError if any page fails, including after earlier pages were yielded.
+    """
+    url = f"{base_url}/graphql/knowledgeGraph/v1"
     
-    try:
-        async with aiohttp.ClientSession() as session:
-            print(f"Making request to {url}")
-            print(f"Query payload: {json.dumps(payload, indent=2)}")
+    after = None
+    while True:
+        variables = {"typeId": asset_type_id, "limit": ASSET_PAGE_SIZE}
+        if after is not None:
+            variables["after"] = after
+        
+        payload = {
+            "query": build_assets_query(after),
+            "variables": variables
+        }
+        
+        try:
+            if logger.isEnabledFor(logging.DEBUG):
+                logger.debug("Making request to %s", url)
+                logger.debug("Query payload: %s", json.dumps(payload))
             
-            async with session.post(url, json=payload, headers=headers) as response:
-                print(f"Response status: {response.status}")
+            # The asset list must always be current, so it bypasses the response cache entirely
+            # (revalidation alone would serve a stale copy when the server sends no ETag)
+            async with session.post(url, json=payload, expire_after=0) as response:
+                logger.debug("Response status: %s", response.status)
                 
                 if response.status != 200:
-                    print(f"HTTP Error: {response.status}")
                     response_text = await response.text()
-                    print(f"Response body: {response_text}")
-                    return []
+                    raise AssetListingError(f"HTTP Error: {response.status}, response body: {response_text}")
                     
-                data = await response.json()
-                
-                if "errors" in data:
-                    print("GraphQL Errors:", json.dumps(data["errors"], indent=2))
-                    return []
+                content_length = int(response.headers.get('Content-Length', 0))
+                if content_length and content_length < STREAM_THRESHOLD_BYTES:
+                    data = orjson.loads(await response.read())
                     
-                if "data" in data and "assets" in data["data"]:
-                    assets = data["data"]["assets"]
-                    print(f"Successfully retrieved {len(assets)} assets")
-                    return [asset["id"] for asset in assets]
+                    if "errors" in data:
+                        raise AssetListingError(f"GraphQL Errors: {json.dumps(data['errors'], indent=2)}")
+                        
+                    if "data" in data and "assets" in data["data"]:
+                        assets = data["data"]["assets"]
+                        logger.debug("Successfully retrieved %d assets", len(assets))
+                        asset_ids = [asset["id"] for asset in assets]
+                        page_count = len(asset_ids)
+                        last_id = asset_ids[-1] if asset_ids else None
+                    else:
+                        raise AssetListingError(f"Unexpected response structure: {json.dumps(data, indent=2)}")
                 else:
-                    print(f"Unexpected response structure: {json.dumps(data, indent=2)}")
-                    return []
+                    # Hand out IDs while the rest of the body is still arriving,
+                    # collecting any GraphQL errors reported alongside them
+                    asset_ids = []
+                    page_count = 0
+                    errors = None
+                    found_assets = False
+                    async for prefix, event, value in ijson.parse(response.content):
+                        if prefix == 'data.assets' and event == 'start_array':
+                            found_assets = True
+                        elif prefix == 'data.assets.item.id' and event == 'string':
+                            asset_ids.append(value)
+                            page_count += 1
+                            last_id = value
+                            if len(asset_ids) >= STREAM_BATCH_SIZE:
+                                yield asset_ids
+                                asset_ids = []
+                        elif prefix == 'errors' or prefix.startswith('errors.'):
+                            if errors is None:
+                                errors = ijson.ObjectBuilder()
+                            errors.event(event, value)
+                    
+                    if errors is not None:
+                        raise AssetListingError(f"GraphQL Errors: {json.dumps(errors.value, indent=2)}")
+                    if not found_assets:
+                        raise AssetListingError("Unexpected response structure: streamed response has no data.assets")
+                    logger.debug("Successfully streamed %d assets", page_count)
                 
-    except aiohttp.ClientError as e:
-        print(f"Network error in get_all_assets: {str(e)}")
-        return []
-    except Exception as e:
-        print(f"Unexpected error in get_all_assets: {str(e)}")
-        print(f"Error type: {type(e)}")
-        return []
-
-def get_all_assets(asset_type_id: str, base_url: str, bearer_token: str) -> List[str]:
-    """
-    Synchronous wrapper for async get_all_assets function.
-    """
-    return asyncio.run(get_all_assets_async(asset_type_id, base_url, bearer_token))
\ No newline at end of file
+        except AssetListingError:
+            raise
+        except aiohttp.ClientError as e:
+            raise AssetListingError(f"Network error in get_all_assets_async: {e}") from e
+        except Exception as e:
+            raise AssetListingError(f"Unexpected error in get_all_assets_async: {e} ({type(e)})") from e
+        
+        if asset_ids:
+            yield asset_ids
+        
+        if page_count < ASSET_PAGE_SIZE:
+            return
+        after = last_id
\ No newline at end of file
@@ -1,17 +1,60 @@
 import os
+import time
+import asyncio
 import logging
+import aiohttp
+import orjson
 import requests
+from typing import Dict, List
 from dotenv import load_dotenv
 from OauthAuth import oauth_bearer_token
+from async_utils import evict_cached_response
 
 load_dotenv()
 
-logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+logging.basicConfig(level=os.getenv('LOG_LEVEL', 'INFO').upper(), format='%(asctime)s - %(levelname)s - %(message)s')
 
 session = requests.Session()
 #session.verify = os.getenv('SSL_CERT')
 
+# Asset type names rarely change, so lookups are cached and persisted between runs
+ASSET_TYPE_NAME_CACHE_TTL = int(os.getenv('ASSET_TYPE_NAME_CACHE_TTL', '86400'))
+
+_name_cache = {}
+
+def load_asset_type_name_cache(filepath: str):
+    """
+    Load cached asset type names from disk, skipping entries older than the TTL.
+    """
+    try:
+        with open(filepath, 'rb') as f:
+            entries = orjson.loads(f.read())
+    except FileNotFoundError:
+        return
+    except (OSError, orjson.JSONDecodeError) as e:
+        logging.warning(f"Ignoring unreadable asset type name cache {filepath}: {e}")
+        return
+
+    now = time.time()
+    for asset_type_id, entry in entries.items():
+        if now - entry.get('fetched_at', 0) < ASSET_TYPE_NAME_CACHE_TTL:
+            _name_cache[asset_type_id] = entry
+
+def save_asset_type_name_cache(filepath: str):
+    """
+    Persist cached asset type names to disk.
+    """
+    try:
+        with open(filepath, 'wb') as f:
+            f.write(orjson.dumps(_name_cache))
+    except OSError as e:
+        logging.warning(f"Could not save asset type name cache {filepath}: {e}")
+
 def get_asset_type_name(asset_type_id):
+    cached = _name_cache.get(asset_type_id)
+    if cached:
+        return cached['name']
+
     base_url = os.getenv('COLLIBRA_INSTANCE_URL')
     url = f"https://{base_url}/rest/2.0/assetTypes/{asset_type_id}"
 
@@ -20,7 +63,51 @@ def get_asset_type_name(asset_type_id):
         response = session.get(url)
         response.raise_for_status()
         json_response = response.json()
+        _name_cache[asset_type_id] = {'name': json_response["name"], 'fetched_at': time.time()}
         return json_response["name"]
     except requests.RequestException as e:
         logging.error(f"Asset type not found in Collibra: {e}")
-        return None
\ No newline at end of file
+        return None
+
+async def get_asset_type_names_async(asset_type_ids: List[str], base_url: str, session: aiohttp.ClientSession) -> Dict[str, str]:
+    """
+    Get the names of many asset types with one aliased GraphQL query, using cached names where available.
+    Asset types the query does not resolve are looked up individually through the REST API.
+    """
+    missing = [asset_type_id for asset_type_id in asset_type_ids if asset_type_id not in _name_cache]
+
+    if missing:
+        url = f"{base_url}/graphql/knowledgeGraph/v1"
+        query = "query {\n" + "\n".join(
+            f'n{i}: assetType(id: "{asset_type_id}") {{ name }}' for i, asset_type_id in enumerate(missing)
+        ) + "\n}"
+
+        request_info = {'method': 'POST', 'url': url, 'json': {"query": query}}
+
+        try:
+            async with session.post(url, json=request_info['json'], refresh=True) as response:
+                data = orjson.loads(await response.read())
+
+            if "errors" in data:
+                logging.error(f"GraphQL errors while fetching asset type names: {data['errors']}")
+                await evict_cached_response(session, request_info)
+
+            fetched_at = time.time()
+            for i, asset_type_id in enumerate(missing):
+                asset_type = (data.get("data") or {}).get(f"n{i}")
+                if asset_type and asset_type.get("name"):
+                    _name_cache[asset_type_id] = {'name': asset_type["name"], 'fetched_at': fetched_at}
+        except (aiohttp.ClientError, orjson.JSONDecodeError) as e:
+            logging.error(f"Error fetching asset type names: {e}")
+
+        await asyncio.gather(*(
+            asyncio.to_thread(get_asset_type_name, asset_type_id)
+            for asset_type_id in missing
+            if asset_type_id not in _name_cache
+        ))
+
+    return {
+        asset_type_id: _name_cache[asset_type_id]['name']
+        for asset_type_id in asset_type_ids
+        if asset_type_id in _name_cache
+    }
\ No newline at end of file
@@ -1,26 +1,41 @@
+import asyncio
+import aiohttp
+import numpy as np
 import pandas as pd
+import pyarrow as pa
+import pyarrow.csv as pcsv
 import os
-import json
+import logging
+import orjson
 from datetime import datetime
 from dotenv import load_dotenv
-from optimized_counts import get_all_counts
-from get_all_assets import get_all_assets
+from async_utils import create_session
+from optimized_counts import get_counts_async
+from get_all_assets import AssetListingError, get_all_assets_async
 from OauthAuth import oauth_bearer_token
-from get_assetType_name import get_asset_type_name
+from get_assetType_name import get_asset_type_names_async, load_asset_type_name_cache, save_asset_type_name_cache
+
+# uvloop is not available on Windows, where the default asyncio event loop is used
+try:
+    import uvloop
+except ImportError:
+    uvloop = None
 
 # Load environment variables
 load_dotenv(override=True)
 
+logger = logging.getLogger(__name__)
+
 def load_asset_type_ids(filepath: str = "Collibra_Asset_Type_Id_Manager.json") -> list:
     """
     Load asset type IDs from JSON file.
     """
     try:
-        with open(filepath, 'r') as f:
-            data = json.load(f)
+        with open(filepath, 'rb') as f:
+            data = orjson.loads(f.read())
             return data.get('ids', [])
     except Exception as e:
-        print(f"Error loading asset type IDs: {e}")
+        logger.error("Error loading asset type IDs: %s", e)
         return []
 
 def get_base_url() -> str:
@@ -32,48 +47,97 @@ def get_base_url() -> str:
         raise ValueError("COLLIBRA_INSTANCE_URL not set in environment variables")
     return f"https://{instance_url}"
 
-def process_asset_type(asset_type_id: str, asset_type_name: str, base_url: str, bearer_token: str) -> pd.DataFrame:
+async def cancel_tasks(tasks: list):
+    """
+    Cancel tasks that are still running and wait for them to finish.
+    """
+    for task in tasks:
+        task.cancel()
+    await asyncio.gather(*tasks, return_exceptions=True)
+
+async def process_asset_type(asset_type_id: str, asset_type_name: str, base_url: str, session: aiohttp.ClientSession) -> pd.DataFrame:
     """
     Process a single asset type and return its data as a DataFrame.
     """
-    print(f"\nProcessing asset type: {asset_type_name} ({asset_type_id})")
+    logger.info("Processing asset type: %s (%s)", asset_type_name, asset_type_id)
     
-    # Get asset IDs
-    print("Fetching asset IDs...")
-    asset_ids = get_all_assets(asset_type_id, base_url, bearer_token)
+    # Get asset IDs page by page, counting each page as soon as it arrives
+    asset_ids = []
+    count_tasks = []
+    try:
+        async for page in get_all_assets_async(asset_type_id, base_url, session):
+            asset_ids.extend(page)
+            count_tasks.append(asyncio.create_task(get_counts_async(page, base_url, session)))
+    except AssetListingError as e:
+        # A partial listing would report truncated totals, so the whole asset type is dropped
+        await cancel_tasks(count_tasks)
+        logger.error("Could not list all assets of type %s, skipping it: %s", asset_type_name, e)
+        return pd.DataFrame()
     
     if not asset_ids:
-        print("No assets found for this asset type.")
+        logger.info("No assets found for asset type %s.", asset_type_name)
         return pd.DataFrame()
         
-    print(f"Found {len(asset_ids)} assets. Fetching details...")
+    logger.info("Found %d assets of type %s. Waiting for details...", len(asset_ids), asset_type_name)
+    
+    # Collect the counts of every page, in the same order as asset_ids
+    try:
+        page_counts = await asyncio.gather(*count_tasks)
+    except Exception as e:
+        # Only this asset type is lost; the others are still written
+        await cancel_tasks(count_tasks)
+        logger.error("Could not count assets of type %s, skipping it: %s", asset_type_name, e)
+        return pd.DataFrame()
     
-    # Get all counts concurrently
-    counts = get_all_counts(asset_ids, base_url, bearer_token)
+    # Create DataFrame column by column
+    def count_column(count_type: str) -> np.ndarray:
+        return np.concatenate([counts[count_type] for counts in page_counts])
     
-    # Create DataFrame
-    data = []
-    for asset_id in asset_ids:
-        asset_counts = counts.get(asset_id, {})
-        data.append({
-            'assetId': asset_id,
-            'assetTypeName': asset_type_name,
-            'assetTypeId': asset_type_id,
-            'attributeCount': asset_counts.get('attributes', 0),
-            'incomingRelationCount': asset_counts.get('incoming', 0),
-            'outgoingRelationCount': asset_counts.get('outgoing', 0),
-            'responsibilitiesRelationCount': asset_counts.get('responsibilities', 0)
-        })
+    df = pd.DataFrame({
+        'assetId': asset_ids,
+        'assetTypeName': asset_type_name,
+        'assetTypeId': asset_type_id,
+        'attributeCount': count_column('attributes'),
+        'incomingRelationCount': count_column('incoming'),
+        'outgoingRelationCount': count_column('outgoing'),
+        'responsibilitiesRelationCount': count_column('responsibilities')
+    })
     
-    return pd.DataFrame(data)
+    # The asset type columns hold a single repeated value, stored once as a category
+    df['assetTypeName'] = df['assetTypeName'].astype('category')
+    df['assetTypeId'] = df['assetTypeId'].astype('category')
+    return df
+
+def set_column_widths(worksheet, df: pd.DataFrame):
+    """
+    Fit each column to its longest value, measured on the DataFrame instead of the worksheet cells.
+    """
+    for i, column in enumerate(df.columns):
+        max_length = max(df[column].astype(str).str.len().max(), len(column))
+        worksheet.set_column(i, i, max_length + 2)
+
+def write_rows(worksheet, df: pd.DataFrame, first_row: int = 1):
+    """
+    Write DataFrame rows in order, as required by xlsxwriter's constant-memory mode.
+    """
+    for row, values in enumerate(df.itertuples(index=False, name=None), start=first_row):
+        worksheet.write_row(row, 0, values)
 
 def save_to_excel(dataframes: dict, output_file: str):
     """
     Save data to Excel with multiple sheets and formatting.
+    
+    Rows are streamed to disk in constant-memory mode, so every sheet is
+    written strictly top to bottom: header first, then data, then totals.
     """
-    print(f"\nSaving data to Excel: {output_file}")
+    logger.info("Saving data to Excel: %s", output_file)
     
-    with pd.ExcelWriter(output_file, engine='openpyxl') as writer:
+    with pd.ExcelWriter(output_file, engine='xlsxwriter', engine_kwargs={'options': {'constant_memory': True}}) as writer:
+        workbook = writer.book
+        header_format = workbook.add_format({'bold': True, 'font_size': 13, 'bottom': 2})
+        summary_header_format = workbook.add_format({'bold': True, 'font_size': 13, 'bottom': 5})
+        total_format = workbook.add_format({'bold': True, 'top': 1, 'bottom': 6})
+        
         # Summary sheet
         summary_data = []
         total_assets = 0
@@ -81,29 +145,15 @@ def save_to_excel(dataframes: dict, output_file: str):
         # Write each asset type to its own sheet and collect summary data
         for asset_type_name, df in dataframes.items():
             if not df.empty:
-                # Write the data
-                df.to_excel(writer, sheet_name=asset_type_name[:31], index=False)  # Excel sheet names limited to 31 chars
+                sheet_name = asset_type_name[:31]  # Excel sheet names limited to 31 chars
+                worksheet = workbook.add_worksheet(sheet_name)
                 
-                # Access the worksheet
-                worksheet = writer.sheets[asset_type_name[:31]]
+                # Format headers and adjust column widths
+                worksheet.write_row(0, 0, df.columns, header_format)
+                set_column_widths(worksheet, df)
                 
-                # Format headers
-                for col in range(1, df.shape[1] + 1):
-                    cell = worksheet.cell(row=1, column=col)
-                    cell.style = 'Headline 3'
-                
-                # Adjust column widths
-                for column in worksheet.columns:
-                    max_length = 0
-                    column = list(column)
-                    for cell in column:
-                        try:
-                            if len(str(cell.value)) > max_length:
-                                max_length = len(str(cell.value))
-                        except:
-                            pass
-                    adjusted_width = (max_length + 2)
-                    worksheet.column_dimensions[column[0].column_letter].width = adjusted_width
+                # Write the data
+                write_rows(worksheet, df)
                 
                 # Collect summary data
                 asset_count = len(df)
@@ -124,7 +174,7 @@ def save_to_excel(dataframes: dict, output_file: str):
         # Create and write summary sheet
         summary_df = pd.DataFrame(summary_data)
         if not summary_df.empty:
-            # Add totals row
+            # Totals row
             totals = {
                 'Asset Type': 'TOTAL',
                 'Asset Type ID': '',
@@ -133,37 +183,33 @@ def save_to_excel(dataframes: dict, output_file: str):
                 'Total Relations': summary_df['Total Relations'].sum(),
                 'Total Responsibilities': summary_df['Total Responsibilities'].sum()
             }
-            summary_df = pd.concat([summary_df, pd.DataFrame([totals])], ignore_index=True)
             
-            summary_df.to_excel(writer, sheet_name='Summary', index=False)
+            worksheet = workbook.add_worksheet('Summary')
             
-            # Format summary sheet
-            worksheet = writer.sheets['Summary']
+            # Format headers and adjust column widths
+            worksheet.write_row(0, 0, summary_df.columns, summary_header_format)
+            set_column_widths(worksheet, pd.concat([summary_df, pd.DataFrame([totals])], ignore_index=True))
             
-            # Format headers
-            for col in range(1, summary_df.shape[1] + 1):
-                cell = worksheet.cell(row=1, column=col)
-                cell.style = 'Headline 2'
+            write_rows(worksheet, summary_df)
             
             # Format totals row
-            for col in range(1, summary_df.shape[1] + 1):
-                cell = worksheet.cell(row=summary_df.shape[0], column=col)
-                cell.style = 'Total'
-            
-            # Adjust column widths
-            for column in worksheet.columns:
-                max_length = 0
-                column = list(column)
-                for cell in column:
-                    try:
-                        if len(str(cell.value)) > max_length:
-                            max_length = len(str(cell.value))
-                    except:
-                        pass
-                adjusted_width = (max_length + 2)
-                worksheet.column_dimensions[column[0].column_letter].width = adjusted_width
+            worksheet.write_row(summary_df.shape[0] + 1, 0, list(totals.values()), total_format)
 
-def main():
+def save_to_csv(df: pd.DataFrame, output_file: str):
+    """
+    Save data to CSV using Arrow's multi-threaded writer.
+    """
+    table = pa.Table.from_pandas(df, preserve_index=False)
+    pcsv.write_csv(table, output_file)
+
+def save_to_json(df: pd.DataFrame, output_file: str):
+    """
+    Save data to JSON as a list of records.
+    """
+    with open(output_file, 'wb') as f:
+        f.write(orjson.dumps(df.to_dict('records'), option=orjson.OPT_SERIALIZE_NUMPY))
+
+async def amain():
     try:
         # Get base URL from environment
         base_url = get_base_url()
@@ -178,27 +224,42 @@ def main():
         if not asset_type_ids:
             raise ValueError("No asset type IDs found in configuration file")
         
-        # Process each asset type
-        dataframes = {}
-        for asset_type_id in asset_type_ids:
-            # Get asset type name
-            asset_type_name = get_asset_type_name(asset_type_id)
-            if not asset_type_name:
-                print(f"Warning: Could not get name for asset type {asset_type_id}, using ID instead")
-                asset_type_name = f"AssetType_{asset_type_id[:8]}"
+        # Create output directory if it doesn't exist
+        output_dir = os.getenv('FILE_SAVE_LOCATION', 'outputs')
+        os.makedirs(output_dir, exist_ok=True)
+        
+        # Use one shared session for every request
+        async with create_session(bearer_token) as session:
+            # Get all asset type names in one request, reusing names cached by earlier runs
+            name_cache_file = os.path.join(output_dir, '.asset_type_names.json')
+            load_asset_type_name_cache(name_cache_file)
+            names = await get_asset_type_names_async(asset_type_ids, base_url, session)
+            save_asset_type_name_cache(name_cache_file)
             
-            df = process_asset_type(asset_type_id, asset_type_name, base_url, bearer_token)
-            if not df.empty:
-                dataframes[asset_type_name] = df
+            asset_type_names = []
+            for asset_type_id in asset_type_ids:
+                asset_type_name = names.get(asset_type_id)
+                if not asset_type_name:
+                    logger.warning("Could not get name for asset type %s, using ID instead", asset_type_id)
+                    asset_type_name = f"AssetType_{asset_type_id[:8]}"
+                asset_type_names.append(asset_type_name)
+            
+            # Process all asset types concurrently
+            results = await asyncio.gather(
+                *(process_asset_type(asset_type_id, asset_type_name, base_url, session)
+                  for asset_type_id, asset_type_name in zip(asset_type_ids, asset_type_names))
+            )
+        
+        dataframes = {
+            asset_type_name: df
+            for asset_type_name, df in zip(asset_type_names, results)
+            if not df.empty
+        }
         
         if not dataframes:
-            print("No data found for any asset type.")
+            logger.info("No data found for any asset type.")
             return
             
-        # Create output directory if it doesn't exist
-        output_dir = os.getenv('FILE_SAVE_LOCATION', 'outputs')
-        os.makedirs(output_dir, exist_ok=True)
-        
         # Generate output filename with timestamp
         timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
         output_format = os.getenv('OUTPUT_FORMAT', 'csv').lower()
@@ -217,18 +278,24 @@ def main():
             # Combine all dataframes for non-Excel formats
             final_df = pd.concat(dataframes.values(), ignore_index=True)
             if output_format == 'csv':
-                final_df.to_csv(output_file, index=False)
+                save_to_csv(final_df, output_file)
             elif output_format == 'json':
-                final_df.to_json(output_file, orient='records')
+                save_to_json(final_df, output_file)
             else:
-                print(f"Unsupported output format: {output_format}. Defaulting to CSV.")
+                logger.warning("Unsupported output format: %s. Defaulting to CSV.", output_format)
                 output_file = os.path.join(output_dir, f'asset_counts_{timestamp}.csv')
-                final_df.to_csv(output_file, index=False)
+                save_to_csv(final_df, output_file)
             
-        print(f"\nResults saved to {os.path.abspath(output_file)}")
+        logger.info("Results saved to %s", os.path.abspath(output_file))
         
     except Exception as e:
-        print(f"Error in main execution: {e}")
+        logger.error("Error in main execution: %s", e)
+
+def main():
+    if uvloop is not None:
+        uvloop.run(amain())
+    else:
+        asyncio.run(amain())
 
 if __name__ == "__main__":
     main()
\ No newline at end of file